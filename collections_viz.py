@@ -11,19 +11,17 @@ import logging
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
-import re
 
 from datetime import date
 
 
-INPUT_COLUMNS = set(["CALL NUMBER", "PUB YR", "HOME LOC", "ITEM DATE",
-                     "Last 10 yrs"])
-UNUSED_LOCS = set(["TIMO-COLL", "TERM-COLL", "EQUIPMENT"])
-LABEL_CALLS = set(["QC", "QA", "TA", "TK", "TN", "Z", "QD",
-                  "BF", "HG", "P", "TJ", "T", "RC", "LB"])
-CHART_CALLS = set(["QA", "TA", "TK", "TJ", "T", "TL"])
+INPUT_COLUMNS = ["CALL NUMBER", "PUB YR", "HOME LOC", "ITEM DATE",
+                 "Last 10 yrs"]
+UNUSED_LOCS = frozenset(["TIMO-COLL", "TERM-COLL", "EQUIPMENT"])
+LABEL_CALLS = frozenset(["QC", "QA", "TA", "TK", "TN", "Z", "QD",
+                         "BF", "HG", "P", "TJ", "T", "RC", "LB"])
+CHART_CALLS = frozenset(["QA", "TA", "TK", "TJ", "T", "TL"])
 
 
 def ParseCommandArgs():
@@ -50,7 +48,10 @@ def RunCollectionsViz(circ_file):
     circ_file: (str) Path (relative or absolute) to the Circ Stats report.
   """
   df_circ = pd.read_excel(
-    circ_file, sheet_name="circ_rpt190702174508_copies_all", header=0)
+    circ_file, sheet_name="circ_rpt190702174508_copies_all", header=0,
+    engine="calamine", usecols=INPUT_COLUMNS,
+    dtype={"CALL NUMBER": "string", "HOME LOC": "category"},
+    parse_dates=["ITEM DATE"])
 
   df_circ = ParseCircStatsFile(df_circ)
   OutputAccumulationChart(df_circ)
@@ -66,20 +67,18 @@ def ParseCircStatsFile(df_circ):
   Returns:
     DataFrame with collections info needed for visualization.
   """
-  # Select only needed colums for collection items. Exclude Terman,
-  # Timoshenko collection items.
-  df_circ = df_circ.loc[
-      ~df_circ["HOME LOC"].isin(UNUSED_LOCS), INPUT_COLUMNS]
+  # Exclude Terman, Timoshenko collection items; only needed columns are
+  # read from the report in the first place.
+  df_circ = df_circ.loc[~df_circ["HOME LOC"].isin(UNUSED_LOCS), :]
   
-  # Add columns for beginning letter(s) of call number.
-  df_circ["CALL LETTER"] = pd.Series(["Other"] * df_circ.shape[0],
-                                     index=df_circ.index)
-  for row, circ_series in df_circ.iterrows():
-    letter = re.match(r"[A-Z]+", df_circ.loc[row, "CALL NUMBER"]).group(0)
-    df_circ.loc[row, "CALL LETTER"] = letter
-
-  # Add column for age.
-  cur_year = date.today().year 
+  # Add column for beginning letter(s) of call number. Categorical codes
+  # make the downstream groupbys and isin filters integer-based.
+  df_circ["CALL LETTER"] = df_circ["CALL NUMBER"].str.extract(
+      r"^([A-Z]+)", expand=False).fillna("Other").astype("category")
+
+  # Add column for age. Downcast PUB YR so AGE lands in a small int dtype.
+  cur_year = date.today().year
+  df_circ["PUB YR"] = pd.to_numeric(df_circ["PUB YR"], downcast="integer")
   df_circ["AGE"] = cur_year - df_circ["PUB YR"]
   logging.info("There are %d items in the collection.", df_circ.shape[0])
   return df_circ
@@ -92,7 +91,7 @@ def Output3dScatterplot(df_circ):
   Args:
     df_circ: (DataFrame) DF with stats per collection item.
   """
-  grouped = df_circ.groupby("CALL LETTER").agg(
+  grouped = df_circ.groupby("CALL LETTER", observed=True).agg(
       {"AGE": "median", "CALL LETTER": "count",
        "Last 10 yrs": "sum"})
   grouped = grouped.rename(
@@ -142,14 +141,20 @@ def OutputAccumulationChart(df_circ):
   Args:
     df_circ: (DataFrame) DF with stats per collection item.
   """
-  df_circ["ADDED YEAR"] = df_circ["ITEM DATE"].apply(lambda d: str(d)[0:4])
-  df_circ["ADDED YEAR"] = pd.to_numeric(df_circ["ADDED YEAR"])
+  df_circ["ADDED YEAR"] = df_circ["ITEM DATE"].dt.year.astype("int32")
+
+  # Sort and rank all charted call letters in one pass, then slice the
+  # sorted frame per group for plotting.
+  df_chart = df_circ.loc[df_circ["CALL LETTER"].isin(CHART_CALLS), :]
+  df_chart = df_chart.sort_values(["CALL LETTER", "ADDED YEAR"])
+  df_chart["ACCUMULATION"] = df_chart.groupby(
+      "CALL LETTER", observed=True).cumcount()
 
   fix, ax = plt.subplots()
-  for call in CHART_CALLS:
-    years = df_circ.loc[df_circ["CALL LETTER"] == call, "ADDED YEAR"].values
-    sorted_years = np.sort(years)
-    ax.step(sorted_years, np.arange(sorted_years.size), label=call)
+  for call, group in df_chart.groupby("CALL LETTER", sort=False,
+                                      observed=True):
+    ax.step(group["ADDED YEAR"].values, group["ACCUMULATION"].values,
+            label=call)
   ax.grid(True)
   ax.legend(loc="upper left", shadow=True)
   ax.set_title("Accumulation of items over time")
@@ -8,22 +8,35 @@ them tabularly along with their cost estimates from the previous year.
 
 import argparse
 import logging
-import numpy as np
 import pandas as pd
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
 
-RECURRING_TYPES = set(["4EXCH2", "APPROVAL2", "BLANKET", "EXCHANGE", "EXCHSER",
-                       "GIFTSER", "REPLACE2", "SCORES2", "STANDING", "SUBSCRIPT",
-                       "TERMSET", "UNITARY2", "CATREC2", "DATAB2", "DATAB2PUR",
-                       "EBOOK2", "EBOOK2PUR", "ELEC2", "E-PACKAGE", "MAINTFEE",
-                       "COMBO", "COMBO-CHG", "DATASET2", "MEMBERSHIP", "PACKAGE",
-                       "SO-COMBO", "AUDIO2", "MAP2", "MICRO", "VISUAL2", "DEPNDT",
-                       "DEPOSIT", "FISCAL2", "SHIPPING"])
-OUTPUT_COLUMNS = set(["ORDER ID", "ORD LINE", "ORDER TYPE",
-                      "VENDOR ID", "TITLE", "CATALOG KEY"])
+RECURRING_TYPES = frozenset(
+    ["4EXCH2", "APPROVAL2", "BLANKET", "EXCHANGE", "EXCHSER",
+     "GIFTSER", "REPLACE2", "SCORES2", "STANDING", "SUBSCRIPT",
+     "TERMSET", "UNITARY2", "CATREC2", "DATAB2", "DATAB2PUR",
+     "EBOOK2", "EBOOK2PUR", "ELEC2", "E-PACKAGE", "MAINTFEE",
+     "COMBO", "COMBO-CHG", "DATASET2", "MEMBERSHIP", "PACKAGE",
+     "SO-COMBO", "AUDIO2", "MAP2", "MICRO", "VISUAL2", "DEPNDT",
+     "DEPOSIT", "FISCAL2", "SHIPPING"])
+OUTPUT_COLUMNS = ["ORDER ID", "ORD LINE", "ORDER TYPE",
+                  "VENDOR ID", "TITLE", "CATALOG KEY"]
+EXPENDITURE_COLUMNS = ["Order ID", "Amt Paid on Fund (including tax)",
+                       "Date to AP"]
+
+# Orders missing from the Open Orders report due to their NOFUND status.
+NOFUND_ORDERS = pd.DataFrame(
+    [["965855F15", 1, "E-PACKAGE", "GRI", "SIMPLYANALYTICS", 11060871],
+     ["454035F19", 1, "DATAB2", "PLANETLAB",
+         "PLANET LABS DAILY SATELLITE IMAGERY", 13157872],
+     ["177114F07", 1, "E-PACKAGE", "NERL", "SAGE JOURNALS", 6847241],
+     ["527176F11", 1, "E-PACKAGE", "ESRI",
+         "ESRI EDUCATIONAL SITE LICENSE", 9652252]],
+    columns=["ORDER ID", "ORD LINE", "ORDER TYPE",
+             "VENDOR ID", "TITLE", "CATALOG KEY"])
 
 
 def ParseCommandArgs():
@@ -57,9 +70,11 @@ def RunRecurringPurchases(orders_file, expenditures_file, csv=False):
     csv: (bool) Whether the user would like output as a csv (default is png).
   """
   df_ord = pd.read_excel(
-      orders_file, sheet_name="enc_rpt1563914632", header=0)
+      orders_file, sheet_name="enc_rpt1563914632", header=0,
+      engine="calamine", usecols=OUTPUT_COLUMNS)
   df_exp = pd.read_excel(
-      expenditures_file, sheet_name="EngExpenditures2019", header=0)
+      expenditures_file, sheet_name="EngExpenditures2019", header=0,
+      engine="calamine", usecols=EXPENDITURE_COLUMNS)
 
   df_ord = AddManualOrders(df_ord)
   upcoming_orders = ParseOrdersFile(df_ord)
@@ -77,16 +92,7 @@ def AddManualOrders(df_ord):
   Returns:
     DataFrame df_ord appended with info on NOFUND orders.
   """
-  nofund_ord = pd.DataFrame(
-    [["965855F15", 1, "E-PACKAGE", "GRI", "SIMPLYANALYTICS", 11060871],
-     ["454035F19", 1, "DATAB2", "PLANETLAB", 
-         "PLANET LABS DAILY SATELLITE IMAGERY", 13157872],
-     ["177114F07", 1, "E-PACKAGE", "NERL", "SAGE JOURNALS", 6847241],
-     ["527176F11", 1, "E-PACKAGE", "ESRI",
-         "ESRI EDUCATIONAL SITE LICENSE", 9652252]],
-    columns=["ORDER ID", "ORD LINE", "ORDER TYPE",
-             "VENDOR ID", "TITLE", "CATALOG KEY"])
-  return df_ord.append(nofund_ord, ignore_index=True)
+  return pd.concat([df_ord, NOFUND_ORDERS], ignore_index=True)
 
 
 def ParseOrdersFile(df_ord):
@@ -99,25 +105,15 @@ def ParseOrdersFile(df_ord):
   Returns:
     A DataFrame with selected info on upcoming recurring purchases.
   """
-  # Select only needed columns from rows of recurring order types.
-  df_ord = df_ord.loc[df_ord["ORDER TYPE"].isin(RECURRING_TYPES), OUTPUT_COLUMNS]
-  
-  # Flatten table into a dict, with unique orders as keys and values being lists
-  # of orderlines.  We want to keep only those with a single orderline of value 1.
-  order_dict = {}
-  for row, order_series in df_ord.iterrows():
-    if order_series["ORDER ID"] not in order_dict:
-      order_dict[order_series["ORDER ID"]] = [order_series["ORD LINE"]]
-    else:
-      order_dict[order_series["ORDER ID"]].append(order_series["ORD LINE"])
-
-  # Select only order rows with the single orderline 1.
-  upcoming_list = []
-  for order_id, ordline_list in order_dict.items():
-    if len(ordline_list) == 1 and ordline_list[0] == 1:
-      upcoming_list.append(order_id)
+  # Keep only rows of recurring order types; only needed columns are read
+  # from the report in the first place. Categorical codes make the isin
+  # test integer-based rather than hashing every string.
+  df_ord["ORDER TYPE"] = df_ord["ORDER TYPE"].astype("category")
+  df_ord = df_ord.loc[df_ord["ORDER TYPE"].isin(RECURRING_TYPES), :]
   
-  df_ord = df_ord.loc[df_ord["ORDER ID"].isin(upcoming_list), :]
+  # Keep only orders with a single orderline of value 1.
+  order_sizes = df_ord.groupby("ORDER ID")["ORD LINE"].transform("size")
+  df_ord = df_ord.loc[(order_sizes == 1) & (df_ord["ORD LINE"] == 1), :]
   logging.info("There are %d upcoming recurring orders.", df_ord.shape[0])
   return df_ord
 
@@ -133,21 +129,18 @@ def FetchPreviousPrice(df_exp, df_ord):
   Returns:
     DataFrame of upcoming recurring purchases augmented with price column.
   """
-  df_ord["PREV COST"] = pd.Series(np.zeros(df_ord.shape[0], np.float),
-                                  index=df_ord.index)
-  df_ord["PREV DATE PAID"] = pd.Series(["N/A"] * df_ord.shape[0],
-                                       index=df_ord.index)
-  
-  for row, order_series in df_ord.iterrows():
-    order_id = order_series["ORDER ID"]
-    order_costs = df_exp.loc[df_exp["Order ID"] == order_id,
-                             "Amt Paid on Fund (including tax)"]
-    df_ord.loc[row, "PREV COST"] = order_costs.sum()
-    order_dates = df_exp.loc[df_exp["Order ID"] == order_id, "Date to AP"]
-    
-    if not order_dates.empty:
-      df_ord.loc[row, "PREV DATE PAID"] = order_dates.iat[0].strftime("%Y-%m-%d")
-  
+  # Aggregate expenditures once per order, then join onto the orders table.
+  df_prev = df_exp.groupby("Order ID", sort=False).agg(
+      **{"PREV COST": ("Amt Paid on Fund (including tax)", "sum"),
+         "PREV DATE PAID": ("Date to AP", "first")}).reset_index()
+  df_prev["PREV DATE PAID"] = df_prev["PREV DATE PAID"].dt.strftime(
+      "%Y-%m-%d").astype("string")
+
+  df_ord = df_ord.merge(df_prev, how="left",
+                        left_on="ORDER ID", right_on="Order ID")
+  df_ord = df_ord.drop(columns="Order ID")
+  df_ord["PREV COST"] = df_ord["PREV COST"].fillna(0.0)
+  df_ord["PREV DATE PAID"] = df_ord["PREV DATE PAID"].fillna("N/A")
   return df_ord
 
 
@@ -179,13 +172,11 @@ def OutputUpcomingOrders(df_ord, csv):
     table.set_fontsize(16)
 
     cells = table.get_celld()
-    for r in range(0, df_ord.shape[0] + 1):
-      for c in range(0, df_ord.shape[1]):
-        cur_cell = cells[(r, c)]
-        cur_cell.set_edgecolor("darkgray")
-        cur_cell.set_height(0.02)
-        if r == 0:
-          cur_cell.set_text_props(weight="bold", color="navy")
+    for cur_cell in cells.values():
+      cur_cell.set_edgecolor("darkgray")
+      cur_cell.set_height(0.02)
+    for c in range(0, df_ord.shape[1]):
+      cells[(0, c)].set_text_props(weight="bold", color="navy")
     fig.tight_layout()
     plt.savefig("recurring.png", format="png")
     logging.info("Table saved.")
@@ -9,11 +9,55 @@ import argparse
 import logging
 import openpyxl
 import re
-import requests
-from lxml import html
+import requests_cache
+from concurrent import futures
+from dataclasses import dataclass
+from lxml import etree, html
+from openpyxl.utils import column_index_from_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 VERSION = 1
+MAX_WORKERS = 16
+REQUEST_TIMEOUT = 10
+
+# One shared session keeps pooled Keep-Alive connections to Springer,
+# avoiding a fresh TCP+TLS handshake per request across worker threads.
+# Responses are cached on disk indefinitely, so reruns and resumed runs
+# skip the network for already-seen DOIs.
+ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                      max_retries=Retry(total=3, backoff_factor=0.3))
+SESSION = requests_cache.CachedSession("springer_cache", expire_after=None,
+                                       allowable_codes=(200, 301, 404))
+SESSION.mount("http://", ADAPTER)
+SESSION.mount("https://", ADAPTER)
+
+# XPath expressions and regexes used on every book page, compiled once.
+XP_SERIES = etree.XPath("//p[@data-test='test-series']/a/text()")
+XP_VOLUME = etree.XPath("//p[@data-test='test-series']/span/text()")
+XP_YEAR = etree.XPath("//span[@id='copyright-info']/text()")
+XP_PACKAGE = etree.XPath("//a[@id='ebook-package']/text()")
+XP_SUBSERIES = etree.XPath("//p[@data-test='test-subseries']/a/text()")
+XP_LANDOLT_SERIES = etree.XPath("//div[@class='publication-title']/span/text()")
+XP_LANDOLT_VOLUME = etree.XPath(
+    "//div[@class='document__enumeration']/span/text()")
+
+ACRONYM_RE = re.compile(r"\(([A-Za-z\+]+)")
+VOLUME_RE = re.compile(r"volume (.+)\)")
+YEAR_RE = re.compile(r"\d\d\d\d")
+LANDOLT_VOLUME_RE = re.compile(r"Volume (.+) ")
+
+
+@dataclass(slots=True)
+class BookInfo:
+  """Series and publishing metadata for one book."""
+  series: str = "Unavailable"
+  acronym: str = ""
+  volume: str = ""
+  year: str = ""
+  package: str = ""
+  subseries: str = ""
 
  
 def ParseCommandArgs():
@@ -55,45 +99,78 @@ def RunReportEnhancement(filename, first_row, doi_col, issn_col, rerun):
   split_filename = filename.split(".")
   new_filename = split_filename[0] + "_v" + str(VERSION) + "." + split_filename[1]
 
-  series_col = ord(issn_col) - 63
-  acronym_col = series_col + 1
-  volume_col = series_col + 2
-  year_col = series_col + 3
-  package_col = series_col + 4
-  subseries_col = series_col + 5
-  if rerun:
-    wb = openpyxl.load_workbook(new_filename)
-    ws = wb["Sheet0"]
-  else:
-    wb = openpyxl.load_workbook(filename)
-    ws = wb["Sheet0"]
-    ws.insert_cols(series_col, amount=6)
-
-  # for i in range(8960, 8980):
-  for i in range(first_row, ws.max_row + 1):
-    issn = ws.cell(row=i, column=(ord(issn_col) - 64)).value
-    if issn:
+  doi_idx = column_index_from_string(doi_col) - 1
+  issn_idx = column_index_from_string(issn_col) - 1
+  series_idx = issn_idx + 1
+
+  # Bulk-read the sheet once. read_only mode streams rows without the
+  # per-cell bookkeeping of the default workbook model.
+  source_filename = new_filename if rerun else filename
+  wb = openpyxl.load_workbook(source_filename, read_only=True, data_only=True)
+  ws = wb["Sheet0"]
+  rows = [list(row) for row in ws.iter_rows(values_only=True)]
+  wb.close()
+  width = max([len(row) for row in rows] + [issn_idx + 1])
+  for row in rows:
+    row.extend([None] * (width - len(row)))
+
+  if not rerun:
+    for row in rows:
+      row[series_idx:series_idx] = [None] * 6
+
+  # Fan the network fetches out to a thread pool; the work is I/O-bound,
+  # so threads overlap the round trips. Results are written back into
+  # rows in the main thread as they complete.
+  book_rows = [i for i in range(first_row - 1, len(rows)) if rows[i][issn_idx]]
+  with futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    future_rows = {executor.submit(FetchBookInfo, rows[i][doi_idx]): i
+                   for i in book_rows}
+    for future in futures.as_completed(future_rows):
+      i = future_rows[future]
+      book_info = future.result()
       book_count += 1
-      doi = ws.cell(row=i, column=(ord(doi_col) - 64)).value
-      book_html, landolt = RequestBookInfoPage(doi)
-      if landolt:
-        book_dict = ParseLandoltBookPage(book_html)
-      else:
-        book_dict = ParseBookPage(book_html)
-      
-      logging.debug("Row %d: %s", i, book_dict["series"])
-      ws.cell(row=i, column=series_col).value = book_dict["series"]
-      ws.cell(row=i, column=acronym_col).value = book_dict["acronym"]
-      ws.cell(row=i, column=volume_col).value = book_dict["volume"]
-      ws.cell(row=i, column=year_col).value = book_dict["year"]
-      ws.cell(row=i, column=package_col).value = book_dict["package"]
-      ws.cell(row=i, column=subseries_col).value = book_dict["subseries"]
-    if i % 1000 == 0: wb.save(new_filename)
-  
-  wb.save(new_filename)
+      logging.debug("Row %d (%d/%d): %s", i + 1, book_count, len(book_rows),
+                    book_info.series)
+      rows[i][series_idx:series_idx + 6] = [
+          book_info.series, book_info.acronym, book_info.volume,
+          book_info.year, book_info.package, book_info.subseries]
+      if book_count % 1000 == 0: SaveEnhancedReport(rows, new_filename)
+
+  SaveEnhancedReport(rows, new_filename)
   logging.info("Enhanced %d books.", book_count)
 
 
+def FetchBookInfo(doi):
+  """
+  Fetches and parses a single book's info page.
+
+  Args:
+    doi: (str) DOI of book.
+
+  Returns:
+    A BookInfo populated with series and publishing metadata.
+  """
+  book_html, landolt = RequestBookInfoPage(doi)
+  if landolt:
+    return ParseLandoltBookPage(book_html)
+  return ParseBookPage(book_html)
+
+
+def SaveEnhancedReport(rows, new_filename):
+  """
+  Writes the enhanced report rows to disk in one streaming pass.
+
+  Args:
+    rows: (list) List of row value lists, including headers.
+    new_filename: (str) Path for the output Excel file.
+  """
+  wb = openpyxl.Workbook(write_only=True)
+  ws = wb.create_sheet("Sheet0")
+  for row in rows:
+    ws.append(row)
+  wb.save(new_filename)
+
+
 def RequestBookInfoPage(doi):
   """
   Retrieves HTML content of a book's information page at link.springer.com.
@@ -108,22 +185,21 @@ def RequestBookInfoPage(doi):
   base_url = ("http://link.springer.com/")
   landolt = False
 
-  # The book info page is sought for in 3 places in sequence. Resorting to the
-  # dx.doi.org URL means the book is in the Landolt-Bornstein series.
-  book_request = base_url + "book/" + doi + "#about" 
-  book_page = requests.get(book_request)        
-
-  if book_page.status_code == 404:
+  # The book info page is sought for in 3 places in sequence; cheap HEAD
+  # probes rule out 404s without downloading their bodies. Resorting to
+  # the dx.doi.org URL means the book is in the Landolt-Bornstein series.
+  book_request = base_url + "book/" + doi + "#about"
+  if SESSION.head(book_request, timeout=REQUEST_TIMEOUT,
+                  allow_redirects=True).status_code == 404:
     book_request = base_url + "referencework/" + doi + "#about"
-    book_page = requests.get(book_request)
-       
-    if book_page.status_code == 404:
+    if SESSION.head(book_request, timeout=REQUEST_TIMEOUT,
+                    allow_redirects=True).status_code == 404:
       book_request = "http://dx.doi.org/" + doi
-      book_page = requests.get(book_request)
-      landolt = True      
+      landolt = True
 
-      if book_page.status_code == 404:
-        return None, False
+  book_page = SESSION.get(book_request, timeout=REQUEST_TIMEOUT)
+  if book_page.status_code == 404:
+    return None, False
 
   return html.fromstring(book_page.content), landolt
 
@@ -136,29 +212,28 @@ def ParseBookPage(book_html):
     book_html: (HTML Element) HTML representing the book's info page.
 
   Returns:
-    A dict populated with series and publishing metadata.
+    A BookInfo populated with series and publishing metadata.
   """
-  book_dict = dict(series="Unavailable", acronym="", volume="",
-                   year="", package="", subseries="")
+  book_info = BookInfo()
   if book_html is not None:
-    series_text = book_html.xpath("//p[@data-test='test-series']/a/text()")
-    if series_text: book_dict["series"] = str(series_text[0].encode("utf-8"))
-    volume_text = book_html.xpath("//p[@data-test='test-series']/span/text()")
+    series_text = XP_SERIES(book_html)
+    if series_text: book_info.series = str(series_text[0])
+    volume_text = XP_VOLUME(book_html)
     if volume_text:
-      a = re.search(r"\(([A-Za-z\+]+)", str(volume_text[0].encode("utf-8")))
-      if a: book_dict["acronym"] = a.group(1)
-      v = re.search(r"volume (.+)\)", str(volume_text[0].encode("utf-8")))
-      if v: book_dict["volume"] = v.group(1)
-    year_text = book_html.xpath("//span[@id='copyright-info']/text()")
+      a = ACRONYM_RE.search(volume_text[0])
+      if a: book_info.acronym = a.group(1)
+      v = VOLUME_RE.search(volume_text[0])
+      if v: book_info.volume = v.group(1)
+    year_text = XP_YEAR(book_html)
     if year_text:
-      y = re.search(r"\d\d\d\d", str(year_text[0].encode("utf-8")))
-      if y: book_dict["year"] = int(y.group(0))
-    package_text = book_html.xpath("//a[@id='ebook-package']/text()")
-    if package_text: book_dict["package"] = str(package_text[0].encode("utf-8"))
-    subseries_text = book_html.xpath("//p[@data-test='test-subseries']/a/text()")
-    if subseries_text: book_dict["subseries"] = str(subseries_text[0].encode("utf-8"))
-  
-  return book_dict
+      y = YEAR_RE.search(year_text[0])
+      if y: book_info.year = int(y.group(0))
+    package_text = XP_PACKAGE(book_html)
+    if package_text: book_info.package = str(package_text[0])
+    subseries_text = XP_SUBSERIES(book_html)
+    if subseries_text: book_info.subseries = str(subseries_text[0])
+
+  return book_info
 
 
 def ParseLandoltBookPage(book_html):
@@ -169,23 +244,20 @@ def ParseLandoltBookPage(book_html):
     book_html: (HTML Element) HTML representing the book's info page.
 
   Returns:
-    A dict populated with series and publishing metadata.
+    A BookInfo populated with series and publishing metadata.
   """
-  book_dict = dict(series="Unavailable", acronym="", volume="",
-                   year="", package="", subseries="")
+  book_info = BookInfo()
   if book_html is not None:
-    series_text = book_html.xpath(
-        "//div[@class='publication-title']/span/text()")
-    if series_text: book_dict["series"] = str(series_text[0].encode("utf-8"))
-    volume_text = book_html.xpath(
-        "//div[@class='document__enumeration']/span/text()")
+    series_text = XP_LANDOLT_SERIES(book_html)
+    if series_text: book_info.series = str(series_text[0])
+    volume_text = XP_LANDOLT_VOLUME(book_html)
     if volume_text:
-      v = re.search(r"Volume (.+) ", str(volume_text[0].encode("utf-8")))
-      if v: book_dict["volume"] = v.group(1)
-      y = re.search(r"\d\d\d\d", str(volume_text[0].encode("utf-8")))
-      if y: book_dict["year"] = int(y.group(0))
-  
-  return book_dict
+      v = LANDOLT_VOLUME_RE.search(volume_text[0])
+      if v: book_info.volume = v.group(1)
+      y = YEAR_RE.search(volume_text[0])
+      if y: book_info.year = int(y.group(0))
+
+  return book_info
 
 
 def main():